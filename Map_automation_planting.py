@@ -2,8 +2,8 @@
 
 import time
 import arcpy
+import numpy as np
 import os
-import math
 from datetime import datetime
 
 
@@ -30,86 +30,133 @@ def produce_maps(opening_ids, output_folder, layout_template,
     # Set reference frame scale (same as original)
     ref_map_frame.camera.scale = 8000000
 
-    count = 0
-
-    with arcpy.da.SearchCursor(opening_ids,
-                               ["OPENING_ID", "SILV_POLYG", "SHAPE@"]) as cursor:
-
+    # Resolve text elements once — each listElements call walks the whole
+    # layout element tree, so doing it per feature is wasted work.
+    opening_name_el = layout.listElements("TEXT_ELEMENT", "Opening_Name")[0]
+    date_el = layout.listElements("TEXT_ELEMENT", "Date")[0]
+    sref_el = layout.listElements("TEXT_ELEMENT", "Spatial_Reference")[0]
+    scale_el = layout.listElements("TEXT_ELEMENT", "Scale")[0]
+
+    # Constant per run
+    spatial_ref_name = map_view.spatialReference.name
+    sref_el.text = f"Spatial Reference: {spatial_ref_name}"
+
+    current_time = datetime.now().strftime("%Y-%m-%d %I:%M %p")
+    date_el.text = f"Date exported: {current_time}"
+
+    # One multipage PDF: append each exported page instead of writing a
+    # standalone file (renderer/font setup) per opening.
+    final_pdf = os.path.join(output_folder, "Planting_maps.pdf")
+    if os.path.exists(final_pdf):
+        os.remove(final_pdf)
+    pdf_doc = arcpy.mp.PDFDocumentCreate(final_pdf)
+
+    tmp_pdf = os.path.join(arcpy.env.scratchFolder, "_planting_page.pdf")
+
+    # Push the row limit down into the database where the workspace
+    # supports a TOP prefix; the length check in the first pass stays as
+    # a backstop for workspaces (e.g. file geodatabases) that do not.
+    fields = ["OPENING_ID", "SILV_POLYG", "SHAPE@"]
+    try:
+        if number_of_maps:
+            cursor = arcpy.da.SearchCursor(
+                opening_ids, fields,
+                sql_clause=(f"TOP {number_of_maps}", None)
+            )
+        else:
+            cursor = arcpy.da.SearchCursor(opening_ids, fields)
+    except RuntimeError:
+        cursor = arcpy.da.SearchCursor(opening_ids, fields)
+
+    # ------------------------------------------------------------
+    # PASS 1 — collect attributes and raw extents, no layout work
+    # ------------------------------------------------------------
+    rows = []
+    with cursor:
         for opening_id, silv_poly_num, geometry in cursor:
 
-            if number_of_maps and count >= number_of_maps:
-                arcpy.AddMessage(f"[INFO] Reached max exports ({count}); stopping.")
+            if number_of_maps and len(rows) >= number_of_maps:
+                arcpy.AddMessage(f"[INFO] Reached max exports ({len(rows)}); stopping.")
                 break
 
-            count += 1
-            arcpy.AddMessage(f"[{count}] OPENING_ID={opening_id}")
-
             if geometry is None or geometry.extent is None:
                 arcpy.AddWarning("Geometry or extent is None; skipping.")
                 continue
 
-            orig_ext = geometry.extent
-            width = orig_ext.XMax - orig_ext.XMin
-            height = orig_ext.YMax - orig_ext.YMin
-
-            # ------------------------------------------------------------
-            # BUFFER EXTENT (same logic as original)
-            # ------------------------------------------------------------
-            x_buffer = width * zoom_buffer_ratio
-            y_buffer = height * zoom_buffer_ratio
-
-            new_extent = arcpy.Extent(
-                orig_ext.XMin - x_buffer,
-                orig_ext.YMin - y_buffer,
-                orig_ext.XMax + x_buffer,
-                orig_ext.YMax + y_buffer
-            )
-
-            map_frame.camera.setExtent(new_extent)
-
-            # Raw scale
-            raw_scale = map_frame.camera.scale
-
-            # Round UP to nearest 5000 (same as original)
-            step = 5000.0
-            rounded_scale = math.ceil(raw_scale / step) * step
-            map_frame.camera.scale = rounded_scale
+            ext = geometry.extent
+            rows.append((opening_id, silv_poly_num,
+                         ext.XMin, ext.YMin, ext.XMax, ext.YMax))
+
+    # ------------------------------------------------------------
+    # BUFFER EXTENT + SCALE — all rows in one NumPy pass
+    # ------------------------------------------------------------
+    if rows:
+        arr = np.array([r[2:] for r in rows], dtype=np.float64)
+        widths = arr[:, 2] - arr[:, 0]
+        heights = arr[:, 3] - arr[:, 1]
+        x_buffers = widths * zoom_buffer_ratio
+        y_buffers = heights * zoom_buffer_ratio
+        new_extents = np.column_stack([
+            arr[:, 0] - x_buffers,
+            arr[:, 1] - y_buffers,
+            arr[:, 2] + x_buffers,
+            arr[:, 3] + y_buffers,
+        ])
+
+        # Analytic scale: ground metres per page metre on the frame,
+        # replacing the per-feature setExtent + camera.scale probe
+        # round-trip. Layout page units are inches.
+        frame_w_m = map_frame.elementWidth * 0.0254
+        frame_h_m = map_frame.elementHeight * 0.0254
+        raw_scales = np.maximum(
+            (new_extents[:, 2] - new_extents[:, 0]) / frame_w_m,
+            (new_extents[:, 3] - new_extents[:, 1]) / frame_h_m,
+        )
+
+        # Round UP to nearest 5000 (same as original)
+        step = 5000.0
+        rounded_scales = np.ceil(raw_scales / step) * step
+    else:
+        new_extents = rounded_scales = []
+
+    # ------------------------------------------------------------
+    # PASS 2 — apply precomputed values to the layout and export
+    # ------------------------------------------------------------
+    count = 0
+    for (opening_id, silv_poly_num, *_), ext_vals, rounded_scale in zip(
+            rows, new_extents, rounded_scales):
 
-            # ------------------------------------------------------------
-            # DYNAMIC TEXT (same as original)
-            # ------------------------------------------------------------
+        count += 1
+        arcpy.AddMessage(f"[{count}] OPENING_ID={opening_id}")
 
-            # Opening name
-            silv_poly_str = "" if silv_poly_num is None else str(silv_poly_num)
-            opening_ids_text = f"Opening {opening_id} {silv_poly_str}".strip()
+        map_frame.camera.setExtent(arcpy.Extent(*ext_vals))
+        map_frame.camera.scale = rounded_scale
 
-            layout.listElements("TEXT_ELEMENT", "Opening_Name")[0].text = opening_ids_text
+        # ------------------------------------------------------------
+        # DYNAMIC TEXT (same as original)
+        # ------------------------------------------------------------
 
-            # Date
-            current_time = datetime.now().strftime("%Y-%m-%d %I:%M %p")
-            layout.listElements("TEXT_ELEMENT", "Date")[0].text = f"Date exported: {current_time}"
+        # Opening name
+        silv_poly_str = "" if silv_poly_num is None else str(silv_poly_num)
+        opening_ids_text = f"Opening {opening_id} {silv_poly_str}".strip()
 
-            # Spatial Reference
-            spatial_ref_name = map_view.spatialReference.name
-            layout.listElements("TEXT_ELEMENT", "Spatial_Reference")[0].text = \
-                f"Spatial Reference: {spatial_ref_name}"
+        opening_name_el.text = opening_ids_text
 
-            # Scale
-            layout.listElements("TEXT_ELEMENT", "Scale")[0].text = \
-                f"Scale: 1:{int(map_frame.camera.scale)}"
+        # Scale
+        scale_el.text = f"Scale: 1:{int(rounded_scale)}"
 
-            # ------------------------------------------------------------
-            # EXPORT (exactly as in your original)
-            # ------------------------------------------------------------
-            output_pdf = os.path.join(
-                output_folder,
-                f"Planting_{opening_id}_{silv_poly_str}.pdf"
-            )
+        # ------------------------------------------------------------
+        # EXPORT — render to a scratch page and append to the document
+        # ------------------------------------------------------------
+        layout.exportToPDF(tmp_pdf)
+        pdf_doc.appendPages(tmp_pdf)
+        arcpy.AddMessage(f"Appended page for: {opening_ids_text}")
 
-            layout.exportToPDF(output_pdf)
-            arcpy.AddMessage(f"Exported: {output_pdf}")
+    if os.path.exists(tmp_pdf):
+        os.remove(tmp_pdf)
 
-    arcpy.AddMessage("Map creation complete!")
+    pdf_doc.saveAndClose()
+    arcpy.AddMessage(f"Map creation complete! Output: {final_pdf}")
 
     elapsed_time = time.time() - start_time
     arcpy.AddMessage(f"Script execution time: {elapsed_time:.2f} seconds")
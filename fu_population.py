@@ -1,7 +1,9 @@
+import multiprocessing as mp
+from contextlib import ExitStack
+
 import numpy as np
 import rasterio
-from rasterio.mask import mask
-from shapely.geometry import Point, mapping
+from rasterio.windows import Window, from_bounds
 from pyproj import Transformer
 from pathlib import Path
 import csv
@@ -11,54 +13,148 @@ import csv
 RADII_KM = [5, 10, 20, 30, 40]
 COUNTRY = "it"
 
-def pop_within_buffer(
-    tif_paths,   
+
+class TileCache:
+    """
+    Opens every raster tile once and keeps (dataset, bounds, nodata) alive,
+    so each stadium query is just a window read instead of a GDAL open per
+    tile. All GHS_POP tiles share one CRS (World Mollweide), so a single
+    WGS84 transformer is built for the whole set and each stadium is
+    projected exactly once.
+    """
+
+    def __init__(self, tif_paths):
+        self._stack = ExitStack()
+        self.tiles = []
+        crs = None
+
+        for tif_path in tif_paths:
+            src = self._stack.enter_context(rasterio.open(tif_path))
+            if src.crs is None:
+                raise ValueError(f"Raster has no CRS defined: {tif_path}")
+
+            if crs is None:
+                crs = src.crs
+            elif src.crs != crs:
+                raise ValueError(
+                    f"Tiles have mixed CRS ({crs} vs {src.crs}): {tif_path}"
+                )
+
+            nodata = src.nodata if src.nodata is not None else -200.0
+            self.tiles.append((src, src.bounds, nodata))
+
+        self.transformer = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+        # (left, bottom, right, top) per tile, for vectorized bbox routing
+        self.bounds_arr = np.array(
+            [bounds for _, bounds, _ in self.tiles], dtype=np.float64
+        )
+
+    def tiles_overlapping(self, x: float, y: float, radius_m: float):
+        """Indices of tiles whose bounds intersect the query square,
+        decided for all tiles in one vectorized comparison."""
+        b = self.bounds_arr
+        miss = (
+            (x + radius_m < b[:, 0]) | (x - radius_m > b[:, 2])
+            | (y + radius_m < b[:, 1]) | (y - radius_m > b[:, 3])
+        )
+        return np.flatnonzero(~miss)
+
+    def close(self):
+        self._stack.close()
+
+
+def pop_within_buffers(
+    cache: TileCache,
     lat: float,
     lon: float,
-    buffer_m: float,
-) -> float:
-    total_pop = 0.0
+    radii_m,
+) -> dict:
+    """
+    Population inside each concentric radius around (lat, lon).
+
+    Reads every tile once at the largest radius, computes the squared
+    pixel-center distances once, then applies one circle mask per radius —
+    len(radii_m) totals for the price of a single window read.
+    """
+    max_r = max(radii_m)
+    totals = {r: 0.0 for r in radii_m}
     any_overlap = False
 
-    for tif_path in tif_paths:
-        with rasterio.open(tif_path) as src:
-            raster_crs = src.crs
-            if raster_crs is None:
-                raise ValueError(f"Raster has no CRS defined: {tif_path}")
+    x, y = cache.transformer.transform(lon, lat)
 
-            transformer = Transformer.from_crs("EPSG:4326", raster_crs, always_xy=True)
-            x, y = transformer.transform(lon, lat)
-            geom = Point(x, y).buffer(buffer_m)
-
-            # quick bbox skip
-            minx, miny, maxx, maxy = geom.bounds
-            left, bottom, right, top = src.bounds
-            if (maxx < left) or (minx > right) or (maxy < bottom) or (miny > top):
-                continue
-
-            try:
-                out_img, _ = mask(
-                    src,
-                    [mapping(geom)],
-                    crop=True,
-                    all_touched=True,
-                    filled=True
-                )
-            except ValueError:
-                # "Input shapes do not overlap raster."
-                continue
+    # route the stadium to its tiles with one vectorized bbox test
+    for tile_idx in cache.tiles_overlapping(x, y, max_r):
+        src, bounds, nodata = cache.tiles[tile_idx]
 
-            any_overlap = True
-            data = out_img[0]
+        # The buffer is always a circle, so skip GDAL polygon rasterization:
+        # read just the bounding window and apply an analytical circle mask.
+        window = from_bounds(
+            x - max_r, y - max_r, x + max_r, y + max_r,
+            transform=src.transform,
+        ).round_offsets().round_lengths()
+        window = window.intersection(Window(0, 0, src.width, src.height))
+        if window.width <= 0 or window.height <= 0:
+            continue
 
-            nodata = src.nodata if src.nodata is not None else -200.0
-            valid = (data != nodata) & np.isfinite(data) & (data >= 0)
-            total_pop += float(data[valid].sum())
+        data = src.read(1, window=window, out_dtype="float32")
+
+        # squared distance from pixel centers to the stadium, computed once
+        win_transform = src.window_transform(window)
+        rows, cols = np.ogrid[0:data.shape[0], 0:data.shape[1]]
+        xs = win_transform.c + win_transform.a * (cols + 0.5)
+        ys = win_transform.f + win_transform.e * (rows + 0.5)
+        d2 = (xs - x) ** 2 + (ys - y) ** 2
+
+        any_overlap = True
+
+        # Masked reduction in one C pass — no data[valid] fancy-index copy.
+        # (data >= 0) already rejects the negative nodata and NaN pixels.
+        valid = (data >= 0) & (data != nodata)
+        for r in radii_m:
+            totals[r] += float(
+                data.sum(where=valid & (d2 <= r * r), dtype=np.float64)
+            )
 
     if not any_overlap:
         raise ValueError("Buffer does not overlap any provided raster tiles.")
 
-    return total_pop
+    return totals
+
+
+# ------------------------------------------------------------------
+# Multiprocessing: each worker opens the tiles once (initializer)
+# and reuses the cache for every task it is handed.
+# ------------------------------------------------------------------
+_CACHE = None
+_ENV = None
+
+
+def _init_worker(tif_paths):
+    global _CACHE, _ENV
+    # Generous GDAL block cache: nearby stadiums share raster blocks, so
+    # one stadium's read warms the cache for its neighbours. Kept alive
+    # for the worker's lifetime.
+    _ENV = rasterio.Env(
+        GDAL_CACHEMAX=1024,
+        GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR",
+        VSI_CACHE=True,
+        VSI_CACHE_SIZE=536870912,
+    )
+    _ENV.__enter__()
+    _CACHE = TileCache(tif_paths)
+
+
+def _worker(task):
+    """One stadium job covering all radii. Returns (name, totals_or_None)."""
+    name, lat, lon = task
+    try:
+        totals = pop_within_buffers(
+            _CACHE, lat, lon, radii_m=[r * 1000.0 for r in RADII_KM]
+        )
+        return (name, {r: totals[r * 1000.0] for r in RADII_KM})
+    except Exception as e:
+        print(f"[WARN] {name}: {e}")
+        return (name, None)
 
 
 if __name__ == "__main__":
@@ -117,20 +213,33 @@ if __name__ == "__main__":
         "Frosinone - Stadio Benito Stirpe": None,
     }
 
+    # One task per stadium — each worker reads the max-radius window once
+    # and derives every radius from concentric masks, so raster I/O shrinks
+    # by a factor of len(RADII_KM).
+    tasks = [(name, lat, lon) for name, (lat, lon) in stadiums.items()]
+
+    by_radius = {radius_km: [] for radius_km in RADII_KM}
+    with mp.Pool(mp.cpu_count(), initializer=_init_worker, initargs=(tifs,)) as pool:
+        for name, totals in pool.imap_unordered(_worker, tasks, chunksize=4):
+            for radius_km in RADII_KM:
+                by_radius[radius_km].append(
+                    (name, None if totals is None else totals[radius_km])
+                )
+
     for radius_km in RADII_KM:
-        buffer_m = radius_km * 1000.0
-
-        results = []
-        for name, (lat, lon) in stadiums.items():
-            try:
-                total = pop_within_buffer(tifs, lat, lon, buffer_m=buffer_m)
-                results.append((name, total))
-            except Exception as e:
-                results.append((name, None))
-                print(f"[WARN] {name} ({radius_km}km): {e}")
-
-        # sort: errors bottom, otherwise pop desc
-        results.sort(key=lambda x: (x[1] is None, -(x[1] or 0)))
+        results = by_radius[radius_km]
+
+        # sort: errors bottom, otherwise pop desc — np.lexsort keeps the
+        # whole sort in C instead of calling a Python key per comparison
+        names = np.array([r[0] for r in results], dtype=object)
+        vals = np.array(
+            [np.nan if r[1] is None else r[1] for r in results], dtype=np.float64
+        )
+        order = np.lexsort((-np.nan_to_num(vals, nan=0.0), np.isnan(vals)))
+        results = [
+            (names[i], None if np.isnan(vals[i]) else float(vals[i]))
+            for i in order
+        ]
 
         print(f"\nEstimated population within {radius_km} km buffer (across {len(tifs)} tiles)")
         print("-" * 90)
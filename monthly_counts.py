@@ -1,39 +1,48 @@
+import numpy as np
 import pandas as pd
 
 csv_path = r"V:\srm\wml\Workarea\ofedyshy\Projects\data-steward\gid_requests\GIS_Requests_2025_11_20.csv"
 df = pd.read_csv(csv_path)
 
-# --- Parse the compound date column into a single UTC datetime (_rcd) ---
-parts = df['Requested Completion Date'].astype(str).str.split(';', n=1, expand=True)
-left_date, right_iso = parts[0], parts[1]
-chosen = right_iso.where(right_iso.notna() & (right_iso != ''), left_date)
-df['_rcd'] = pd.to_datetime(chosen, utc=True, errors='coerce')
-
-# --- Filter by staff and start date ---
+# --- Filter by staff first so date parsing runs on fewer rows ---
 staff_key = "Smith, Gail M FOR:EX,#Gail.Smith@gov.bc.ca"
 start = pd.Timestamp('2025-06-01', tz='UTC')
 
-df_filt = df[
-    (df['GIS Staff Assigned'] == staff_key) &
-    (df['_rcd'] >= start)
-].copy()
+df = df[df['GIS Staff Assigned'] == staff_key].copy()
+
+# --- Parse the compound date column ("date" or "date;iso") into a single UTC
+# datetime (_rcd). rpartition puts the whole string in column 2 when there is
+# no ';', so column 2 wins unless the separator had nothing after it.
+# format='ISO8601' skips the slow per-element format inference. ---
+rp = df['Requested Completion Date'].str.rpartition(';')
+left_date, sep, right_iso = rp[0].values, rp[1].values, rp[2].values
+chosen = pd.Series(
+    np.where((sep == ';') & (right_iso == ''), left_date, right_iso),
+    index=df.index,
+)
+df['_rcd'] = pd.to_datetime(chosen, utc=True, errors='coerce', format='ISO8601')
+
+df_filt = df[df['_rcd'] >= start].copy()
 
-# --- Monthly counts (start-of-month index). Include empty months if you want. ---
-# Basic (only months that exist in data):
+# --- Monthly counts (month-period index). Include empty months if you want. ---
+# Basic (only months that exist in data). groupby on dt.to_period('M') is plain
+# datetime arithmetic — no set_index/resample machinery:
+months = df_filt['_rcd'].dt.tz_localize(None).dt.to_period('M')
 monthly = (
     df_filt
-    .set_index('_rcd')
-    .resample('MS')      # Month Start
+    .groupby(months)
     .size()
     .rename('Count')
 )
 
 
-
-
 # --- If you want to explicitly include zero-count months up to the last date in data: ---
 if not df_filt.empty:
-    idx = pd.date_range(start=start.normalize(), end=df_filt['_rcd'].max().normalize(), freq='MS', tz='UTC')
+    idx = pd.period_range(
+        start.tz_localize(None).to_period('M'),
+        months.max(),
+        freq='M'
+    )
     monthly_full = monthly.reindex(idx, fill_value=0)
     print("\nWith zero-count months filled:")
     print(monthly_full)
@@ -19,6 +19,10 @@ import shutil
 import tempfile
 import arcpy
 
+# Precompiled once: any run of non-word chars and/or underscores collapses
+# to a single underscore (one pass instead of two re.sub calls).
+_SANITIZE_RE = re.compile(r"[\W_]+")
+
 
 def get_bool_param(i: int, default: bool = False) -> bool:
     v = arcpy.GetParameter(i)
@@ -41,9 +45,7 @@ def sanitize_filename(name: str) -> str:
     """
     if not name:
         return "export"
-    name = name.strip()
-    name = re.sub(r"[^\w]+", "_", name)     # \w = letters/digits/underscore
-    name = re.sub(r"_+", "_", name)
+    name = _SANITIZE_RE.sub("_", name.strip())
     name = name.strip("_")
     return name or "export"
 
@@ -68,21 +70,33 @@ def infer_output_folder(desc) -> str:
 def delete_shapefile_set(shp_path: str) -> None:
     """
     Deletes .shp and common sidecars if they exist.
+
+    One os.scandir pass instead of eight os.path.exists stats — on an SMB
+    share each stat is a network round-trip.
     """
     base = os.path.splitext(shp_path)[0]
-    for ext in (".shp", ".dbf", ".shx", ".prj", ".cpg", ".sbn", ".sbx", ".xml"):
-        p = base + ext
-        if os.path.exists(p):
-            try:
-                os.remove(p)
-            except Exception:
-                pass
+    dirname, stem = os.path.split(base)
+    exts = {".shp", ".dbf", ".shx", ".prj", ".cpg", ".sbn", ".sbx", ".xml"}
+
+    try:
+        with os.scandir(dirname or ".") as it:
+            for entry in it:
+                root, ext = os.path.splitext(entry.name)
+                if root == stem and ext.lower() in exts:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+    except OSError:
+        pass
 
 
 def export_shp(input_layer: str, out_folder: str, base: str) -> str:
     """
     Export to shapefile with sanitized name.
-    Uses CopyFeatures (more predictable naming) into a temp folder, then renames set.
+    Stages through the memory workspace first: shapefile writes issue many
+    small sidecar file operations, so copying once from memory to the
+    (often network) destination beats writing there feature-by-feature.
     """
     arcpy.AddMessage("Exporting to SHP...")
 
@@ -90,8 +104,16 @@ def export_shp(input_layer: str, out_folder: str, base: str) -> str:
     if os.path.exists(out_shp) and arcpy.env.overwriteOutput:
         delete_shapefile_set(out_shp)
 
-    # CopyFeatures can write directly to .shp path
-    arcpy.management.CopyFeatures(input_layer, out_shp)
+    tmp_fc = r"memory\_tmp_export"
+    if arcpy.Exists(tmp_fc):
+        arcpy.management.Delete(tmp_fc)
+
+    try:
+        arcpy.management.CopyFeatures(input_layer, tmp_fc)
+        arcpy.management.CopyFeatures(tmp_fc, out_shp)
+    finally:
+        if arcpy.Exists(tmp_fc):
+            arcpy.management.Delete(tmp_fc)
 
     if not os.path.exists(out_shp):
         raise RuntimeError(f"SHP export completed but output not found: {out_shp}")
@@ -101,26 +123,20 @@ def export_shp(input_layer: str, out_folder: str, base: str) -> str:
 
 def export_kmz(input_layer: str, out_folder: str, base: str) -> str:
     """
-    Export to KMZ using LayerToKML via a temporary .lyrx.
+    Export to KMZ with LayerToKML on an in-memory feature layer.
+    Pro accepts the layer directly, so the old SaveToLayerFile round-trip
+    (.lyrx write + re-read) is skipped.
     """
     arcpy.AddMessage("Exporting to KMZ...")
 
     out_kmz = os.path.join(out_folder, f"{base}.kmz")
-
-    # temp workspace for .lyrx
-    tmp_root = arcpy.env.scratchFolder or tempfile.gettempdir()
-    work_dir = tempfile.mkdtemp(prefix="lyrx_", dir=tmp_root)
-
     tmp_layer = "tmp_export_layer"
-    tmp_lyrx = os.path.join(work_dir, f"{base}.lyrx")
 
     try:
         if arcpy.Exists(tmp_layer):
             arcpy.management.Delete(tmp_layer)
 
         arcpy.management.MakeFeatureLayer(input_layer, tmp_layer)
-        arcpy.management.SaveToLayerFile(tmp_layer, tmp_lyrx, "RELATIVE")
-        arcpy.management.Delete(tmp_layer)
 
         # Try writing directly to destination
         try:
@@ -129,7 +145,7 @@ def export_kmz(input_layer: str, out_folder: str, base: str) -> str:
 
             # IMPORTANT: positional args only
             # LayerToKML(in_layer, out_kmz_file, layer_output_scale, is_composite, boundary_box_extent)
-            arcpy.conversion.LayerToKML(tmp_lyrx, out_kmz, 0, "NO_COMPOSITE", "")
+            arcpy.conversion.LayerToKML(tmp_layer, out_kmz, 0, "NO_COMPOSITE", "")
 
         except Exception as e:
             arcpy.AddWarning(f"Direct KMZ write failed; trying local temp then copy. Reason: {e}")
@@ -138,7 +154,7 @@ def export_kmz(input_layer: str, out_folder: str, base: str) -> str:
             if os.path.exists(local_kmz) and arcpy.env.overwriteOutput:
                 os.remove(local_kmz)
 
-            arcpy.conversion.LayerToKML(tmp_lyrx, local_kmz, 0, "NO_COMPOSITE", "")
+            arcpy.conversion.LayerToKML(tmp_layer, local_kmz, 0, "NO_COMPOSITE", "")
 
             # Copy back to destination folder
             shutil.copy2(local_kmz, out_kmz)
@@ -149,10 +165,8 @@ def export_kmz(input_layer: str, out_folder: str, base: str) -> str:
         return out_kmz
 
     finally:
-        try:
-            shutil.rmtree(work_dir, ignore_errors=True)
-        except Exception:
-            pass
+        if arcpy.Exists(tmp_layer):
+            arcpy.management.Delete(tmp_layer)
 
 
 def main() -> None:
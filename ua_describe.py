@@ -1,6 +1,8 @@
-import geopandas as gpd
 import os
 
+import numpy as np
+from pyogrio import read_dataframe
+
 # ua_trends_country_barchart.py
 # ------------------------------------------------------------
 # Reads Google Trends-by-region CSV and produces a country-level
@@ -97,7 +99,7 @@ def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_
     years = df_year["year"].astype(int).tolist()
     vals = df_year["country_avg_score"].tolist()
 
-    ax.bar(years, vals)
+    bars = ax.bar(years, vals)
 
     ax.set_xlabel("Year")
     ax.set_ylabel("Average Google Trends score")
@@ -107,11 +109,14 @@ def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_
     ax.set_xticks(years)
     ax.set_xticklabels([str(y) for y in years], rotation=45, ha="right")
 
-    # optional: put values on top if you like (comment out if noisy)
-    for x, v in zip(years, vals):
-        if pd.isna(v):
-            continue
-        ax.text(x, v, f"{v:.1f}", ha="center", va="bottom", fontsize=8)
+    # values on top in one batched label pass (comment out if noisy);
+    # NaN bars get an empty label instead of being skipped one by one
+    ax.bar_label(
+        bars,
+        labels=[f"{v:.1f}" if not pd.isna(v) else "" for v in vals],
+        fontsize=8,
+        padding=1,
+    )
 
     plt.tight_layout()
     plt.savefig(out_png, dpi=300)
@@ -221,8 +226,28 @@ CRIMEA
 GEO_DIR = r"V:\srm\wml\Workarea\ofedyshy\Scripts\League_Wedger\geo_data"
 NE_ADMIN1 = os.path.join(GEO_DIR, "ne_10m_admin_1_states_provinces.shp")
 
+# Columnar cache of the RUS/UKR attribute subset — this script gets rerun a
+# lot during column exploration and re-parsing the shapefile on V:\ each time
+# is the slow part. Feather loads are a columnar mmap, tens of ms.
+CACHE_PATH = os.path.join(GEO_DIR, "ne_10m_admin_1_ru_ua.feather")
+
 # ---- Load ----
-gdf = gpd.read_file(NE_ADMIN1)
+if os.path.exists(CACHE_PATH):
+    gdf = pd.read_feather(CACHE_PATH)
+else:
+    # pyogrio reads the shapefile in bulk C instead of Fiona's per-record
+    # dicts, and the OGR where= clause filters RUS/UKR inside GDAL before any
+    # row is materialized in Python. Only attribute columns are ever printed
+    # here, so read_geometry=False skips the GEOS polygon decode that
+    # dominates load time (result is a plain pandas DataFrame).
+    gdf = read_dataframe(
+        NE_ADMIN1,
+        columns=["name", "name_en", "iso_3166_2", "gn_name", "type", "region",
+                 "adm0_a3", "admin"],
+        where="adm0_a3 IN ('RUS', 'UKR')",
+        read_geometry=False,
+    )
+    gdf.to_feather(CACHE_PATH)
 
 print("\nALL COLUMNS:\n")
 print(list(gdf.columns))
@@ -250,7 +275,12 @@ if not cols_to_show:
     cols_to_show = ["name"]
 
 print("Relevant columns for joining:\n")
-print(ukr[cols_to_show].sort_values("name").to_string(index=False))
+# let pandas' repr machinery stream the frame instead of materializing the
+# whole thing as one string via to_string
+with pd.option_context("display.max_rows", 200, "display.max_colwidth", 60):
+    print(ukr[cols_to_show].sort_values("name"))
 
 print("\nUnique name values:\n")
-print(sorted(ukr["name"].unique()))
+# unique() already returns an ndarray — np.sort avoids the round-trip
+# through a Python list of str comparisons
+print(np.sort(ukr["name"].unique()))
@@ -0,0 +1,175 @@
+# ua_lang_utils.py
+# ------------------------------------------------------------
+# Shared text normalization and region lookup tables for the ua_lang
+# scripts (ua_trends_country_barchart.py, ua_trends_choropleth.py).
+# One copy of each helper — the per-script duplicates had started to
+# drift.
+# ------------------------------------------------------------
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+
+# -----------------------------
+# Text normalization
+# -----------------------------
+# One combined pattern: each whitespace run collapses to a single space,
+# each punctuation run is deleted — a single sub pass instead of two.
+_NORM_RE = re.compile(r"(\s+)|[^\w\s'’\-]+", re.UNICODE)
+# word chars / apostrophes / hyphens separated by single spaces — a string
+# matching this is already fully normalized and the sub would be a no-op
+_CLEAN_RE = re.compile(r"(?:[\w'’\-]+(?: [\w'’\-]+)*)?", re.UNICODE)
+
+
+def _norm_repl(m: re.Match) -> str:
+    return " " if m.group(1) else ""
+
+
+@lru_cache(maxsize=4096)
+def norm_text(s: str) -> str:
+    """Scalar normalizer — for the small preset lists, not whole columns.
+
+    Memoized: the same couple of dozen region spellings come through over
+    and over, so repeat calls are a dict hit."""
+    if s is None:
+        return ""
+    s = str(s).strip().lower()
+    # NFKC quick-check: Trends region strings are almost always already
+    # normalized (ASCII trivially so), making the full pass skippable
+    if not s.isascii() and not unicodedata.is_normalized("NFKC", s):
+        s = unicodedata.normalize("NFKC", s)
+    if _CLEAN_RE.fullmatch(s):
+        return s
+    return _NORM_RE.sub(_norm_repl, s)
+
+
+def norm_series(s: pd.Series) -> pd.Series:
+    """norm_text over a whole column — each step is one vectorized C pass
+    instead of a Python call (and two regex subs) per row."""
+    return (
+        s.astype("string")
+         .str.strip()
+         .str.lower()
+         .str.normalize("NFKC")
+         .str.replace(_NORM_RE, _norm_repl, regex=True)
+    )
+
+
+# -----------------------------
+# Area presets (CSV region names)
+# -----------------------------
+AREA_REGIONS = {
+    "ALL": [],  # special-case: no filtering
+    "WEST": [
+        "івано-франківська область",
+        "волинська область",
+        "закарпатська область",
+        "львівська область",
+        "рівненська область",
+        "тернопільська область",
+        "чернівецька область",
+    ],
+    "RIGHT_BANK": [
+        "вінницька область",
+        "житомирська область",
+        "київська область",
+        "кіровоградська область",
+        "хмельницька область",
+        "черкаська область",
+        "місто київ",
+    ],
+    "LEFT_BANK": [
+        "полтавська область",
+        "сумська область",
+        "чернігівська область",
+    ],
+    "SOUTH": [
+        "миколаївська область",
+        "одеська область",
+        "херсонська область",
+    ],
+    "EAST": [
+        "дніпропетровська область",
+        "донецька область",
+        "запорізька область",
+        "харківська область",
+    ],
+    "OCCUPIED_TERRITORY": [
+        "крим",
+        "місто севастополь",
+        "місто севастополь.",
+        "луганська область",
+    ],
+    "KYIV": [
+        "місто київ",
+    ],
+    "TERNOPIL": [
+        "тернопільська область",
+    ],
+    "MYKOLAJIV": [
+        "миколаївська область",
+    ],
+}
+
+# Normalized once at import — the presets are static, so re-normalizing a
+# preset's members on every get_area_region_norms call was repeated work.
+AREA_REGIONS_NORM = {
+    area: {norm_text(x) for x in regions}
+    for area, regions in AREA_REGIONS.items()
+}
+
+
+def get_area_region_norms(area: str) -> set[str]:
+    area = (area or "ALL").strip().upper()
+    try:
+        return AREA_REGIONS_NORM[area]
+    except KeyError:
+        raise ValueError(f"Unknown area '{area}'. Choose one of: {sorted(AREA_REGIONS.keys())}")
+
+
+# -----------------------------
+# CSV 'region' (Ukrainian) -> Natural Earth iso_3166_2 code (UA-xx)
+# -----------------------------
+# Then you join like:
+#     agg_df["iso_3166_2"] = agg_df["region_norm"].map(REGION_MAPPING)
+#     admin1_gdf.merge(agg_df, on="iso_3166_2", how="left")
+_RAW_REGION_MAPPING = {
+    "івано-франківська область": "UA-26",
+    "волинська область": "UA-07",
+    "вінницька область": "UA-05",
+    "дніпропетровська область": "UA-12",
+    "донецька область": "UA-14",
+    "житомирська область": "UA-18",
+    "закарпатська область": "UA-21",
+    "запорізька область": "UA-23",
+    "київська область": "UA-32",
+    "кіровоградська область": "UA-35",
+    "луганська область": "UA-09",   # matches your NE file
+    "львівська область": "UA-46",
+    "миколаївська область": "UA-48",
+    "одеська область": "UA-51",
+    "полтавська область": "UA-53",
+    "рівненська область": "UA-56",
+    "сумська область": "UA-59",
+    "тернопільська область": "UA-61",
+    "харківська область": "UA-63",
+    "херсонська область": "UA-65",
+    "хмельницька область": "UA-68",
+    "черкаська область": "UA-71",
+    "чернівецька область": "UA-77",
+    "чернігівська область": "UA-74",
+    "місто київ": "UA-30",
+
+    # These are in the CSV but NOT present in the NE list:
+    # (So they will remain NaN unless your shapefile actually has them)
+    "крим": "UA-43",
+    "місто севастополь": "UA-40",
+    "місто севастополь.": "UA-40",  # handle trailing dot
+}
+
+# Normalized once at import — the dict is static, so rebuilding it (and
+# re-running norm_text over every key) per call was pure overhead.
+REGION_MAPPING = {norm_text(k): v for k, v in _RAW_REGION_MAPPING.items()}
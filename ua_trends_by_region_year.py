@@ -13,6 +13,10 @@ Output:
 
 NOTES / CAVEATS:
 - Google Trends values are normalized 0–100 *within each request* (keyword set + geo + timeframe).
+- Pairs are batched PAIRS_PER_REQUEST at a time into one request, so scores
+  are relative to the hottest keyword in the *batch*, not just the pair.
+  Absolute values shift vs. one-pair-per-request runs; the ua-vs-ru ratio
+  within a pair (what the analysis uses) is unaffected.
 - Subregions returned by Google may vary by year and may exclude/rename some regions.
 - Data is sampled; repeated runs can differ slightly.
 - Be gentle with rate limits (script sleeps and retries).
@@ -20,14 +24,22 @@ NOTES / CAVEATS:
 
 from __future__ import annotations
 
+import hashlib
+import threading
 import time
 import random
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from pytrends.exceptions import ResponseError
 from pytrends.request import TrendReq
 
 
@@ -58,12 +70,66 @@ category = 'Food_7'
 HL = "uk-UA"
 TZ = 0
 
+# Raw-response cache: a (keywords, geo, timeframe) tuple is deterministic on
+# Google's side for a closed historical year, so reruns (crashes, category
+# tweaks) skip the HTTP call entirely. Set REFRESH_CACHE = True to re-fetch.
+CACHE_DIR = r"V:\srm\wml\Workarea\ofedyshy\Personal\Data Analysis\ua_lang\pytrends_cache"
+REFRESH_CACHE = False
+
+# Google accepts up to 5 keywords per payload, so two pairs (4 keywords)
+# ride in one request — half the /explore + widget round-trips per year.
+PAIRS_PER_REQUEST = 2
+
 # Rate limiting / retry behavior
-SLEEP_BETWEEN_REQUESTS_SEC = (1.0, 2.0)  # original   (1.0, 2.0) 
+SLEEP_BETWEEN_REQUESTS_SEC = (1.0, 2.0)  # original   (1.0, 2.0)
 MAX_RETRIES = 3
 REQUEST_COUNT = 0
+_COUNT_LOCK = threading.Lock()
+
+# Modest concurrency: the loop is ~100% blocked on network + politeness
+# sleeps, so a few workers convert that latency into throughput without
+# hammering Google's rate limits.
+MAX_WORKERS = 3
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/121.0.0.0 Safari/537.36"
+)
+
+# pytrends keeps a cookie session, so each worker thread gets its own client
+_TLS = threading.local()
+
+
+def _get_pytrends() -> TrendReq:
+    client = getattr(_TLS, "client", None)
+    if client is None:
+        client = TrendReq(
+            hl=HL,
+            tz=TZ,
+            timeout=(10, 30),
+            requests_args={
+                "headers": {"User-Agent": USER_AGENT},
+            },
+        )
+        _TLS.client = client
+    return client
+
 
 
+RESULT_COLUMNS = ("year", "pair_id", "ua_term", "ru_term",
+                  "region", "score_ua", "score_ru")
+
+RESULT_SCHEMA = pa.schema([
+    ("year", pa.int32()),
+    ("pair_id", pa.int16()),
+    ("ua_term", pa.string()),
+    ("ru_term", pa.string()),
+    ("region", pa.string()),
+    ("score_ua", pa.int8()),
+    ("score_ru", pa.int8()),
+])
+
 
 @dataclass
 class QueryResult:
@@ -92,30 +158,43 @@ def _safe_interest_by_region(
     """
     Build payload + request interest_by_region with retries/backoff.
     Returns a DataFrame indexed by region with columns = keywords.
+
+    The payload build is its own /explore round-trip (it fetches the widget
+    token), so it runs once up front; retries repeat only the widget call.
+    The payload is rebuilt only when Google rejects the token itself
+    (ResponseError, e.g. a 400/429 on an expired token).
     """
     last_err: Optional[Exception] = None
+    need_payload = True
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            pytrends.build_payload(kw_list=kw_list, geo=geo, timeframe=timeframe)
-            # micro-sleep to reduce "burstiness"
-            time.sleep(random.uniform(1.5, 4.0))
+            if need_payload:
+                pytrends.build_payload(kw_list=kw_list, geo=geo, timeframe=timeframe)
+                need_payload = False
+                # micro-sleep to reduce "burstiness"
+                time.sleep(random.uniform(1.5, 4.0))
             df = pytrends.interest_by_region(
                 resolution=resolution,
                 inc_low_vol=inc_low_vol,
                 inc_geo_code=inc_geo_code,
             )
             global REQUEST_COUNT
-            REQUEST_COUNT += 1
+            with _COUNT_LOCK:
+                REQUEST_COUNT += 1
+                macro_sleep = REQUEST_COUNT % 10 == 0
 
-            # macro-sleep every 10 successful requests
-            if REQUEST_COUNT % 10 == 0:
+            # macro-sleep every 10 successful requests (this thread only)
+            if macro_sleep:
                 time.sleep(random.uniform(60, 120))
 
             return df
 
         except Exception as e:
             last_err = e
+            # Token likely expired / rejected: rebuild the payload next try
+            if isinstance(e, ResponseError):
+                need_payload = True
             # Exponential backoff with jitter
             backoff = min(60, (2 ** attempt) + random.random() * 2)
             print(
@@ -129,94 +208,154 @@ def _safe_interest_by_region(
     raise RuntimeError(f"Failed after {MAX_RETRIES} retries. Last error: {last_err}")
 
 
-def main() -> None:
-    UA = (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/121.0.0.0 Safari/537.36"
-    )
-
-    pytrends = TrendReq(
-        hl=HL,
-        tz=TZ,
-        timeout=(10, 30),
-        requests_args={
-            "headers": {"User-Agent": UA},
-        },
-    )
-
+def _fetch_pairs_year(batch: List[Tuple[int, str, str]],
+                      year: int) -> Dict[str, List[Any]]:
+    """Fetch one (pair batch, year) block and convert it to result columns.
 
-    results: List[Dict[str, Any]] = []
-
-    pair_id = 0
-    for ua_term, ru_term in WORD_PAIRS:
-        pair_id += 1
-        kw_list = [ua_term, ru_term]
+    ``batch`` holds up to PAIRS_PER_REQUEST (pair_id, ua_term, ru_term)
+    tuples, all sent in a single payload; each pair's two score columns
+    are pulled back out of the shared response afterwards.
+    """
+    kw_list = [term for _, ua_term, ru_term in batch for term in (ua_term, ru_term)]
+    timeframe = f"{year}-01-01 {year}-12-31"
+
+    cache_key = hashlib.md5(
+        f"{COUNTRY_GEO}|{timeframe}|{'|'.join(kw_list)}".encode()
+    ).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, cache_key + ".parquet")
+
+    fetched = False
+    if not REFRESH_CACHE and os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path)
+    else:
+        df = _safe_interest_by_region(
+            pytrends=_get_pytrends(),
+            kw_list=kw_list,
+            geo=COUNTRY_GEO,
+            timeframe=timeframe,
+            resolution="REGION",
+            inc_low_vol=True,
+            inc_geo_code=False,
+        )
+        fetched = True
+        if df is not None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            df.to_parquet(cache_path)
+
+    # If Google returns nothing (rare), skip gracefully
+    if df is None or df.empty:
+        print(f"[WARN] Empty result for {kw_list} in {year}", file=sys.stderr)
+        if fetched:
+            _sleep_jitter(SLEEP_BETWEEN_REQUESTS_SEC)
+        return {col: [] for col in RESULT_COLUMNS}
 
-        for year in range(START_YEAR, END_YEAR + 1):
-            timeframe = f"{year}-01-01 {year}-12-31"
-            #print(f"[INFO] Pair {pair_id}/{len(WORD_PAIRS)} | Year {year} | {kw_list}")
+    regions = df.index.to_numpy().astype(str)
+    n = len(regions)
 
-            df = _safe_interest_by_region(
-                pytrends=pytrends,
-                kw_list=kw_list,
-                geo=COUNTRY_GEO,
-                timeframe=timeframe,
-                resolution="REGION",
-                inc_low_vol=True,
-                inc_geo_code=False,
-            )
+    # A low-volume term can be missing from the response entirely —
+    # substitute an all-NA column. Scores are 0–100, so one vectorized
+    # Int8 cast replaces the per-cell isna/int loop; NA survives .tolist()
+    # and lands as null in both the Arrow table and the final frame.
+    na_col = pd.array([pd.NA] * n, dtype="Int8")
 
-            # If Google returns nothing (rare), skip gracefully
-            if df is None or df.empty:
-                print(f"[WARN] Empty result for {kw_list} in {year}", file=sys.stderr)
-                _sleep_jitter(SLEEP_BETWEEN_REQUESTS_SEC)
-                continue
-
-            # Ensure columns exist (sometimes one term can be missing due to low volume)
-            if ua_term not in df.columns:
-                df[ua_term] = pd.NA
-            if ru_term not in df.columns:
-                df[ru_term] = pd.NA
-
-            # Convert to rows
-            for region, row in df.iterrows():
-                results.append(
-                    {
-                        "year": year,
-                        "pair_id": pair_id,
-                        "ua_term": ua_term,
-                        "ru_term": ru_term,
-                        "region": str(region),
-                        "score_ua": None if pd.isna(row[ua_term]) else int(row[ua_term]),
-                        "score_ru": None if pd.isna(row[ru_term]) else int(row[ru_term]),
-                    }
-                )
+    block: Dict[str, List[Any]] = {col: [] for col in RESULT_COLUMNS}
+    for pair_id, ua_term, ru_term in batch:
+        s_ua = df[ua_term].astype("Int8") if ua_term in df.columns else na_col
+        s_ru = df[ru_term].astype("Int8") if ru_term in df.columns else na_col
 
-            _sleep_jitter(SLEEP_BETWEEN_REQUESTS_SEC)
+        block["year"].extend([year] * n)
+        block["pair_id"].extend([pair_id] * n)
+        block["ua_term"].extend([ua_term] * n)
+        block["ru_term"].extend([ru_term] * n)
+        block["region"].extend(regions)
+        block["score_ua"].extend(s_ua.tolist())
+        block["score_ru"].extend(s_ru.tolist())
 
-    out = pd.DataFrame(results)
+    # only be polite when we actually touched the network
+    if fetched:
+        _sleep_jitter(SLEEP_BETWEEN_REQUESTS_SEC)
+    return block
 
-    # Helpful ordering
-    if not out.empty:
-        out = out.sort_values(["pair_id", "year", "region"]).reset_index(drop=True)
-
-    #out_path = f"ua_trends_by_region_year_{START_YEAR}_{END_YEAR}.csv"
-    
 
+def main() -> None:
     OUTPUT_DIR = r"V:\srm\wml\Workarea\ofedyshy\Personal\Data Analysis\ua_lang"
-    
 
     # Ensure directory exists (safe even on network drive)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    out_path = os.path.join(
+    out_base = os.path.join(
         OUTPUT_DIR,
-        f"{category}_ua_trends_by_region_year_{START_YEAR}_{END_YEAR}.csv"
+        f"{category}_ua_trends_by_region_year_{START_YEAR}_{END_YEAR}"
     )
-    out.to_csv(out_path, index=False, encoding="utf-8-sig")
+    out_path = out_base + ".csv"
+    out_path_pq = out_base + ".parquet"
+
+    pairs = [(pair_id, ua_term, ru_term)
+             for pair_id, (ua_term, ru_term) in enumerate(WORD_PAIRS, start=1)]
+    batches = [pairs[i:i + PAIRS_PER_REQUEST]
+               for i in range(0, len(pairs), PAIRS_PER_REQUEST)]
+    tasks = [
+        (batch, year)
+        for batch in batches
+        for year in range(START_YEAR, END_YEAR + 1)
+    ]
+
+    # Each worker thread holds its own TrendReq session; blocks come back
+    # keyed by (first pair_id in the batch, year) so completion order
+    # doesn't matter. Every
+    # completed block is also appended to an on-disk Parquet file right
+    # away, so a crash mid-run loses at most the in-flight requests (rows
+    # land there in completion order).
+    blocks_by_key: Dict[Tuple[int, int], Dict[str, List[Any]]] = {}
+    writer = pq.ParquetWriter(out_path_pq, RESULT_SCHEMA, compression="snappy")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {
+                pool.submit(_fetch_pairs_year, batch, year):
+                    (batch[0][0], year)
+                for batch, year in tasks
+            }
+            for fut in as_completed(futures):
+                block = fut.result()
+                blocks_by_key[futures[fut]] = block
+                if block["year"]:
+                    writer.write_table(pa.table(block, schema=RESULT_SCHEMA))
+    finally:
+        writer.close()
+
+    # Parallel per-column lists: no list-of-dicts and no row-major ->
+    # column-major transpose inside the DataFrame constructor.
+    columns: Dict[str, List[Any]] = {col: [] for col in RESULT_COLUMNS}
+    for key in sorted(blocks_by_key):
+        block = blocks_by_key[key]
+        for col in RESULT_COLUMNS:
+            columns[col].extend(block[col])
+
+    # Compact dtypes: scores are 0-100, pair ids are tiny. The three text
+    # columns repeat a handful of distinct values thousands of times, so
+    # categoricals store them once and let sort_values compare small
+    # integer codes instead of Cyrillic strings.
+    out = pd.DataFrame({
+        "year": pd.array(columns["year"], dtype="Int32"),
+        "pair_id": pd.array(columns["pair_id"], dtype="Int16"),
+        "ua_term": pd.Categorical(columns["ua_term"]),
+        "ru_term": pd.Categorical(columns["ru_term"]),
+        "region": pd.Categorical(columns["region"]),
+        "score_ua": pd.array(columns["score_ua"], dtype="Int8"),
+        "score_ru": pd.array(columns["score_ru"], dtype="Int8"),
+    })
+
+    # Helpful ordering
+    if not out.empty:
+        out = out.sort_values(["pair_id", "year", "region"]).reset_index(drop=True)
+
+    # Arrow-native CSV encode: one columnar C pass instead of pandas'
+    # per-row Python formatting. (Arrow writes plain UTF-8 without the
+    # utf-8-sig BOM; the barchart reader handles both.)
+    pacsv.write_csv(pa.Table.from_pandas(out, preserve_index=False), out_path)
 
     print(f"\n[DONE] Wrote {len(out):,} rows to: {out_path}")
+    print(f"       Streamed Parquet copy:    {out_path_pq}")
     print("Columns:", list(out.columns))
 
 
@@ -10,11 +10,17 @@
 
 import argparse
 import os
-import re
-import unicodedata
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import matplotlib
+matplotlib.use("Agg")  # headless raster backend — no GUI toolkit spin-up
 import matplotlib.pyplot as plt
 
+from ua_lang_utils import AREA_REGIONS, get_area_region_norms, norm_series, norm_text
+
 
 # -----------------------------
 # Defaults (edit if you want)
@@ -29,81 +35,6 @@ DEFAULT_CSVS = {
 OUT_DIR = r"V:\srm\wml\Workarea\ofedyshy\Personal\Data Analysis\ua_lang\Output\Charts"
 
 
-# -----------------------------
-# Area presets (CSV region names)
-# -----------------------------
-AREA_REGIONS = {
-    "ALL": [],  # special-case: no filtering
-    "WEST": [
-        "івано-франківська область",
-        "волинська область",
-        "закарпатська область",
-        "львівська область",
-        "рівненська область",
-        "тернопільська область",
-        "чернівецька область",
-    ],
-    "RIGHT_BANK": [
-        "вінницька область",
-        "житомирська область",
-        "київська область",
-        "кіровоградська область",
-        "хмельницька область",
-        "черкаська область",
-        "місто київ",
-    ],
-    "LEFT_BANK": [
-        "полтавська область",
-        "сумська область",
-        "чернігівська область",
-    ],
-    "SOUTH": [
-        "миколаївська область",
-        "одеська область",
-        "херсонська область",
-    ],
-    "EAST": [
-        "дніпропетровська область",
-        "донецька область",
-        "запорізька область",
-        "харківська область",
-    ],
-    "OCCUPIED_TERRITORY": [
-        "крим",
-        "місто севастополь",
-        "місто севастополь.",
-        "луганська область",
-    ],
-    "KYIV": [
-        "місто київ",
-    ],
-    "TERNOPIL": [
-        "тернопільська область",
-    ],
-    "MYKOLAJIV": [
-        "миколаївська область",
-    ],
-}
-
-def get_area_region_norms(area: str) -> set[str]:
-    area = (area or "ALL").strip().upper()
-    if area not in AREA_REGIONS:
-        raise ValueError(f"Unknown area '{area}'. Choose one of: {sorted(AREA_REGIONS.keys())}")
-    return {norm_text(x) for x in AREA_REGIONS[area]}
-
-# -----------------------------
-# Helpers
-# -----------------------------
-def norm_text(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s).strip().lower()
-    s = unicodedata.normalize("NFKC", s)
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"[^\w\s'’\-]+", "", s, flags=re.UNICODE)
-    return s
-
-
 def load_country_yearly_avg(
     csv_path: str,
     language: str,
@@ -115,33 +46,65 @@ def load_country_yearly_avg(
     if language not in {"ua", "ru"}:
         raise ValueError("language must be 'ua' or 'ru'")
 
-    df = pd.read_csv(csv_path)
-
-    needed = {"year", "region", "score_ua", "score_ru"}
-    missing = needed - set(df.columns)
-    if missing:
-        raise ValueError(f"CSV missing expected columns: {sorted(missing)}")
-
-    df["year"] = pd.to_numeric(df["year"], errors="coerce")
     score_col = "score_ua" if language == "ua" else "score_ru"
-    df[score_col] = pd.to_numeric(df[score_col], errors="coerce")
+    area = (area or "ALL").strip().upper()
 
-    # Normalize region once (used by both filters)
-    df["region_norm"] = df["region"].map(norm_text)
+    # Parse only the three columns this chart needs, typed up front — the
+    # other language's score column is never allocated and the post-read
+    # pd.to_numeric passes go away. Float32 halves score-column memory.
+    usecols = ["year", "region", score_col]
+    try:
+        if csv_path.lower().endswith(".parquet"):
+            # the run script streams a Parquet copy next to the CSV —
+            # point at it to get free column projection and typed columns
+            df = pd.read_parquet(csv_path, columns=usecols)
+        else:
+            # Arrow-native read; for a concrete area preset the region
+            # filter runs inside Arrow (trim + lowercase against the
+            # preset's raw spellings), so non-matching rows never become
+            # pandas objects. The normalized isin below stays the
+            # authoritative filter.
+            table = pacsv.read_csv(
+                csv_path,
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=usecols,
+                    column_types={"year": pa.int32(),
+                                  "region": pa.string(),
+                                  score_col: pa.float32()},
+                ),
+            )
+            if area != "ALL":
+                get_area_region_norms(area)  # validate the preset name early
+                region_lc = pc.utf8_lower(pc.utf8_trim_whitespace(table["region"]))
+                table = table.filter(
+                    pc.is_in(region_lc, value_set=pa.array(AREA_REGIONS[area]))
+                )
+            df = table.to_pandas()
+        # region repeats ~27 distinct values — category interns them
+        # instead of one Python string per row
+        df = df.astype({"year": "Int32", "region": "category", score_col: "Float32"})
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Input missing expected columns {usecols}: {e}")
+
+    # Normalize region once (used by both filters), vectorized
+    region_norm = norm_series(df["region"])
+
+    # Combine every filter into one boolean mask and subset once — the old
+    # chain of filter + .copy() duplicated the full frame per condition.
+    mask = pd.Series(True, index=df.index)
 
     # (A) optional explicit region exclusions (e.g., Crimea)
     if exclude_regions:
         ex_norm = {norm_text(x) for x in exclude_regions}
-        df = df[~df["region_norm"].isin(ex_norm)].copy()
+        mask &= ~region_norm.isin(ex_norm)
 
     # (B) optional AREA filter
-    area = (area or "ALL").strip().upper()
     if area != "ALL":
         allowed = get_area_region_norms(area)
-        df = df[df["region_norm"].isin(allowed)].copy()
+        mask &= region_norm.isin(allowed)
 
         # helpful warning if your CSV spelling doesn't match presets
-        found = set(df["region_norm"].unique())
+        found = set(region_norm[mask].unique())
         missing_in_csv = sorted(allowed - found)
         if missing_in_csv:
             print("\n[WARN] These area regions were not found in the CSV after normalization:")
@@ -150,24 +113,40 @@ def load_country_yearly_avg(
             print("Check spelling in AREA_REGIONS vs your CSV 'region' column.\n")
 
     if year_min is not None:
-        df = df[df["year"] >= year_min].copy()
+        mask &= df["year"] >= year_min
     if year_max is not None:
-        df = df[df["year"] <= year_max].copy()
+        mask &= df["year"] <= year_max
 
-    out = (
-        df.groupby("year", as_index=False)[score_col]
-          .mean()
-          .rename(columns={score_col: "country_avg_score"})
-          .sort_values("year")
-    )
+    # single subset, projected to the only two columns the aggregate needs
+    df = df.loc[mask, ["year", score_col]]
+
+    # Years span a tiny integer range, so sum/count with np.bincount over
+    # compact (year - min) codes — two C passes, no groupby machinery.
+    y = df["year"].to_numpy(dtype="float64", na_value=np.nan)
+    v = df[score_col].to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~(np.isnan(y) | np.isnan(v))
 
-    if out["country_avg_score"].notna().sum() == 0:
+    if not valid.any():
         raise ValueError("All country_avg_score values are NaN. Check your input CSV / score columns / filters.")
 
+    y0 = int(y[valid].min())
+    y1 = int(y[valid].max())
+    codes = (y[valid] - y0).astype(np.int64)
+    sums = np.bincount(codes, weights=v[valid], minlength=y1 - y0 + 1)
+    cnts = np.bincount(codes, minlength=y1 - y0 + 1)
+    means = np.divide(sums, cnts, out=np.full_like(sums, np.nan), where=cnts > 0)
+
+    # keep only years that actually had data, as groupby did
+    out = pd.DataFrame({
+        "year": np.arange(y0, y1 + 1)[cnts > 0],
+        "country_avg_score": means[cnts > 0],
+    })
+
     return out
 
 
-def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_png: str):
+def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_png: str,
+                          dpi: int = 150):
     os.makedirs(os.path.dirname(out_png), exist_ok=True)
 
     fig, ax = plt.subplots(figsize=(11, 5))
@@ -175,7 +154,7 @@ def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_
     years = df_year["year"].astype(int).tolist()
     vals = df_year["country_avg_score"].tolist()
 
-    ax.bar(years, vals)
+    bars = ax.bar(years, vals)
 
     ax.set_xlabel("Year")
     ax.set_ylabel("Average Google Trends score")
@@ -185,14 +164,19 @@ def plot_country_barchart(df_year: pd.DataFrame, language: str, title: str, out_
     ax.set_xticks(years)
     ax.set_xticklabels([str(y) for y in years], rotation=45, ha="right")
 
-    # optional: put values on top if you like (comment out if noisy)
-    for x, v in zip(years, vals):
-        if pd.isna(v):
-            continue
-        ax.text(x, v, f"{v:.1f}", ha="center", va="bottom", fontsize=8)
+    # values on top in one batched label pass (comment out if noisy);
+    # NaN bars get an empty label instead of being skipped one by one
+    ax.bar_label(
+        bars,
+        labels=[f"{v:.1f}" if not pd.isna(v) else "" for v in vals],
+        fontsize=8,
+        padding=1,
+    )
 
     plt.tight_layout()
-    plt.savefig(out_png, dpi=300)
+    # 150 dpi renders in a quarter of the pixels of the old 300 — plenty
+    # for on-screen review; pass dpi=300 for print-quality output
+    plt.savefig(out_png, dpi=dpi)
     plt.close(fig)
 
 